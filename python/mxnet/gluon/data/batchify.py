@@ -18,13 +18,19 @@
 # coding: utf-8
 # pylint: disable=reimported, consider-using-enumerate
 """Batchify function."""
+import ctypes
+import itertools
 import math
+import operator
 import warnings
 import numpy as np
 
-from ...context import Context, cpu
+from ...base import _LIB, check_call, numeric_types
+from ...context import Context, cpu, current_context
 from ... import ndarray as nd
+from ...ndarray.ndarray import DLDataType, from_numpy
 from ... import numpy as _np
+from ...numpy.multiarray import _reshape_view
 from ...util import is_np_array
 
 class Stack(object):
@@ -65,6 +71,7 @@ class Stack(object):
     """
     def __init__(self, use_shared_mem=False):
         self._use_shared_mem = use_shared_mem
+        self._np_array = None
 
     def __call__(self, data):
         """Batchify the input data
@@ -76,32 +83,159 @@ class Stack(object):
         -------
         batch_data : NDArray
         """
-        _arr = _np if is_np_array() else nd
-        _arr_cls = _arr.ndarray if is_np_array() else _arr.NDArray
+        if self._np_array is None:
+            self._np_array = is_np_array()
+        _arr = _np if self._np_array else nd
+        _arr_cls = _arr.ndarray if self._np_array else _arr.NDArray
         if isinstance(data[0], _arr_cls):
             dtype = data[0].dtype
             if self._use_shared_mem:
                 out = _arr.empty((len(data),) + data[0].shape, dtype=dtype,
                                  ctx=Context('cpu_shared', 0))
-                return _arr.stack(data, out=out) if is_np_array() else _arr.stack(*data, out=out)
+                return _arr.stack(data, out=out) if self._np_array else _arr.stack(*data, out=out)
             else:
-                return _arr.stack(data) if is_np_array() else _arr.stack(*data)
+                return _arr.stack(data) if self._np_array else _arr.stack(*data)
         elif isinstance(data[0], (tuple, list)):
-            data = zip(*data)
-            return [self.__call__(i) for i in data]
+            return [self.__call__(list(map(operator.itemgetter(i), data)))
+                    for i in range(len(data[0]))]
         else:
-            out = np.asarray(data)
-            dtype = out.dtype
-            if self._use_shared_mem:
-                return _arr.array(out, ctx=Context('cpu_shared', 0), dtype=dtype)
-            else:
-                return _arr.array(out, dtype=dtype)
+            # np.array always returns a new buffer that can be handed over without a copy
+            return _wrap_batch(np.array(data), self._use_shared_mem, _arr)
 
     def __mx_handle__(self):
         from ._internal import StackBatchify
         return StackBatchify()
 
-def _pad_arrs_to_max_length(arrs, pad_val, use_shared_mem, dtype, round_to=None):
+def _wrap_batch(ret, use_shared_mem, arr_ns, ctx=None):
+    """Convert a freshly allocated numpy batch into the output array.
+
+    The numpy buffer is owned by the batchify function, so it is handed over to MXNet
+    without a copy whenever the output lives in the ordinary cpu memory.
+
+    Parameters
+    ----------
+    ret : numpy.ndarray
+    use_shared_mem : bool
+    arr_ns : module
+        Either `mxnet.numpy` or `mxnet.ndarray`, selects the type of the output.
+    ctx : Context, default None
+        The context of the output if `use_shared_mem` is False. Defaults to the current context.
+
+    Returns
+    -------
+    ret : NDArray
+    """
+    if use_shared_mem:
+        return arr_ns.array(ret, ctx=Context('cpu_shared', 0), dtype=ret.dtype)
+    ctx = current_context() if ctx is None else ctx
+    if ctx == cpu() and ret.flags['C_CONTIGUOUS'] and str(ret.dtype) in DLDataType.TYPE_MAP:
+        return from_numpy(ret, zero_copy=True,
+                          array_cls=_np.ndarray if arr_ns is _np else nd.NDArray)
+    return arr_ns.array(ret, ctx=ctx, dtype=ret.dtype)
+
+def _empty_shared(shape, dtype, arr_ns):
+    """Allocate an output batch in shared memory together with a numpy view of it.
+
+    Filling the view writes the output directly, instead of filling a numpy batch and
+    copying it into shared memory afterwards. This is only safe for a freshly allocated
+    array, as the engine does not track writes through the view.
+
+    Returns
+    -------
+    out : NDArray
+    ret : numpy.ndarray
+        A view of the memory of `out`.
+    """
+    out = arr_ns.empty(shape, ctx=Context('cpu_shared', 0), dtype=dtype)
+    dtype = np.dtype(dtype)
+    size = int(np.prod(shape))
+    if size == 0:
+        return out, np.empty(shape, dtype=dtype)
+    ptr = ctypes.c_void_p()
+    check_call(_LIB.MXNDArrayGetData(out.handle, ctypes.byref(ptr)))
+    buf = (ctypes.c_char * (size * dtype.itemsize)).from_address(ptr.value)
+    return out, np.frombuffer(buf, dtype=dtype).reshape(shape)
+
+def _pad_flat_numpy(out, flat, offsets, lengths, pad_val):
+    """Scatter the concatenated 1-D samples into the rows of `out`.
+
+    Sample `i` is stored in ``flat[offsets[i]:offsets[i] + lengths[i]]``. It is written
+    to the beginning of ``out[i]`` and the rest of the row is filled with `pad_val`.
+    """
+    # pylint: disable=unused-argument
+    valid = np.arange(out.shape[1]) < lengths[:, None]
+    out[valid] = flat
+    out[~valid] = pad_val
+
+def _pad_flat_loops(out, flat, offsets, lengths, pad_val):
+    """Loop version of `_pad_flat_numpy`, compiled with numba when it is available."""
+    for i in range(out.shape[0]):
+        start = offsets[i]
+        length = lengths[i]
+        for j in range(length):
+            out[i, j] = flat[start + j]
+        for j in range(length, out.shape[1]):
+            out[i, j] = pad_val
+
+# The compiled `_pad_flat_loops`. It is built on first use so that importing mxnet does not
+# import numba, None means not built yet and False means numba is not usable.
+_pad_flat_numba = None
+
+def _get_pad_flat_numba():
+    """Return the compiled pad kernel, or False if numba is not available."""
+    global _pad_flat_numba  # pylint: disable=global-statement
+    if _pad_flat_numba is None:
+        try:
+            import numba
+            # nogil lets batchify functions called from several threads run concurrently
+            _pad_flat_numba = numba.njit(nogil=True)(_pad_flat_loops)
+        except Exception:  # pylint: disable=broad-except
+            _pad_flat_numba = False
+    return _pad_flat_numba
+
+def _pad_flat(out, flat, offsets, lengths, pad_val):
+    """Pad the concatenated 1-D samples into `out`, using numba when it is available."""
+    global _pad_flat_numba  # pylint: disable=global-statement
+    # convert with numpy's rules first, the compiled kernel would silently wrap around
+    pad_val = out.dtype.type(pad_val)
+    if out.dtype.kind in 'biuf' and out.dtype != np.float16:
+        kernel = _get_pad_flat_numba()
+        if kernel:
+            try:
+                kernel(out, flat, offsets, lengths, pad_val)
+                return
+            except Exception:  # pylint: disable=broad-except
+                # numba failed to compile the kernel, do not try again
+                _pad_flat_numba = False
+    _pad_flat_numpy(out, flat, offsets, lengths, pad_val)
+
+def _pad_flat_arrs(flat, lengths, pad_val, use_shared_mem, dtype, round_to, arr_ns):
+    """Pad 1-D samples that are stored back to back in `flat`.
+
+    Parameters
+    ----------
+    flat : numpy.ndarray
+        The concatenation of all the samples.
+    lengths : numpy.ndarray
+        The length of each sample.
+
+    Returns
+    -------
+    ret : NDArray
+    """
+    max_size = int(lengths.max())
+    if round_to is not None:
+        max_size = round_to * math.ceil(max_size / round_to)
+    offsets = np.cumsum(lengths) - lengths
+    ret_shape = (len(lengths), max_size)
+    if use_shared_mem:
+        out, ret = _empty_shared(ret_shape, dtype, arr_ns)
+    else:
+        ret = np.empty(ret_shape, dtype=dtype)
+    _pad_flat(ret, flat.astype(dtype, copy=False), offsets, lengths, pad_val)
+    return out if use_shared_mem else _wrap_batch(ret, False, arr_ns, cpu())
+
+def _pad_arrs_to_max_length(arrs, pad_val, use_shared_mem, dtype, round_to=None, arr_ns=None):
     """Inner Implementation of the Pad batchify
     Parameters
     ----------
@@ -109,49 +243,77 @@ def _pad_arrs_to_max_length(arrs, pad_val, use_shared_mem, dtype, round_to=None)
     pad_val : number
     use_shared_mem : bool, default False
     round_to : int
+    arr_ns : module, default None
+        Either `mxnet.numpy` or `mxnet.ndarray`. If None, it is selected by `is_np_array()`.
 
     Returns
     -------
     ret : NDArray
     """
-    _arr = _np if is_np_array() else nd
-    _arr_cls = _np.ndarray if is_np_array() else nd.NDArray
+    if arr_ns is None:
+        arr_ns = _np if is_np_array() else nd
+    _arr_cls = _np.ndarray if arr_ns is _np else nd.NDArray
     if isinstance(arrs[0], _arr_cls):
-        dtype = arrs[0].dtype if dtype is None else dtype
-        arrs = [arr.asnumpy() for arr in arrs]
+        shapes = [arr.shape for arr in arrs]
+        src_dtype = arrs[0].dtype
+        dtype = src_dtype if dtype is None else dtype
+        if len(shapes[0]) > 0 and all(shape[1:] == shapes[0][1:] for shape in shapes) \
+                and all(arr.dtype == src_dtype for arr in arrs):
+            # Copy the whole batch to numpy at once instead of synchronizing on every sample
+            lengths = np.array([shape[0] for shape in shapes], dtype=np.int64)
+            flat = _np.concatenate(arrs, axis=0) if arr_ns is _np else nd.concat(*arrs, dim=0)
+            flat = flat.asnumpy()
+            if flat.ndim == 1:
+                return _pad_flat_arrs(flat, lengths, pad_val, use_shared_mem, dtype,
+                                      round_to, arr_ns)
+            arrs = np.split(flat, np.cumsum(lengths)[:-1])
+        else:
+            arrs = [arr.asnumpy() for arr in arrs]
     elif not isinstance(arrs[0], np.ndarray):
-        arrs = [np.asarray(ele) for ele in arrs]
-        dtype = arrs[0][0].dtype if dtype is None else dtype
+        # infer the dtype from the first non-empty sample, so that it does not depend on the
+        # order of the samples
+        probe = next((ele for ele in arrs if np.size(ele) > 0), arrs[0])
+        dtype = np.asarray(probe).dtype if dtype is None else dtype
+        if isinstance(arrs[0], list) and np.size(probe) > 0 \
+                and isinstance(probe[0], numeric_types):
+            # Lists of numbers are read into one flat buffer, without a temporary array per sample
+            lengths = np.fromiter(map(len, arrs), dtype=np.int64, count=len(arrs))
+            flat = np.fromiter(itertools.chain.from_iterable(arrs), dtype=dtype,
+                               count=int(lengths.sum()))
+            return _pad_flat_arrs(flat, lengths, pad_val, use_shared_mem, dtype, round_to,
+                                  arr_ns)
+        arrs = [np.asarray(ele, dtype=dtype) for ele in arrs]
     else:
         dtype = arrs[0].dtype if dtype is None else dtype
 
+    if arrs[0].ndim == 1:
+        lengths = np.fromiter((arr.shape[0] for arr in arrs), dtype=np.int64, count=len(arrs))
+        return _pad_flat_arrs(np.concatenate(arrs), lengths, pad_val, use_shared_mem, dtype,
+                              round_to, arr_ns)
+
     ret_shape = list(arrs[0].shape)
-    for pad_axis in range(len(ret_shape)):
-        curr_lengths = [ele.shape[pad_axis] for ele in arrs]
-        max_size = max(curr_lengths)
-        if round_to is not None:
-            max_size = round_to * math.ceil(max_size / round_to)
-        ret_shape[pad_axis] = max_size
+    for arr in arrs:
+        for pad_axis, size in enumerate(arr.shape):
+            if size > ret_shape[pad_axis]:
+                ret_shape[pad_axis] = size
+    if round_to is not None:
+        ret_shape = [round_to * math.ceil(size / round_to) for size in ret_shape]
     ret_shape = (len(arrs), ) + tuple(ret_shape)
 
-    ret = np.full(shape=ret_shape, fill_value=pad_val, dtype=dtype)
+    if use_shared_mem:
+        out, ret = _empty_shared(ret_shape, dtype, arr_ns)
+        ret.fill(pad_val)
+    elif pad_val == 0 and np.issubdtype(dtype, np.number):
+        # calloc-ed zero pages are cheaper than filling the whole buffer
+        ret = np.zeros(shape=ret_shape, dtype=dtype)
+    else:
+        ret = np.full(shape=ret_shape, fill_value=pad_val, dtype=dtype)
 
+    # the padding is already in place, only the valid region of each sample is copied
     for i, arr in enumerate(arrs):
-        if arr.shape == ret_shape[1:]:
-            ret[i] = arr
-        else:
-            slices = [slice(None) for _ in range(arr.ndim)]
-            for pad_axis in range(arr.ndim):
-                slices[pad_axis] = slice(0, arr.shape[pad_axis])
-                assert slices[pad_axis].start != slices[pad_axis].stop
-            slices = [slice(i, i + 1)] + slices
-            ret[tuple(slices)] = arr
-
-
-    ctx = Context('cpu_shared', 0) if use_shared_mem else cpu()
-    ret = _arr.array(ret, ctx=ctx, dtype=dtype)
+        np.copyto(ret[(i,) + tuple(map(slice, arr.shape)) + (Ellipsis,)], arr, casting='unsafe')
 
-    return ret
+    return out if use_shared_mem else _wrap_batch(ret, False, arr_ns, cpu())
 
 
 class Pad(object):
@@ -209,12 +371,16 @@ class Pad(object):
       [ 1.  2. -1. -1.]]]
     <NDArray 2x2x4 @cpu(0)>
     """
+    # The NDArray input warning is only emitted once per process
+    _warned = False
+
     def __init__(self, val=None, dtype=None, round_to=None, use_shared_mem=False):
         self._pad_val = 0 if val is None else val
-        self._dtype = dtype
-        self._warned = False
+        # parse the dtype once instead of on every batch
+        self._dtype = None if dtype is None else np.dtype(dtype)
         self._round_to = round_to
         self._use_shared_mem = use_shared_mem
+        self._np_array = None
 
     def __call__(self, data):
         """Batchify the input data.
@@ -234,20 +400,20 @@ class Pad(object):
         batch_data: NDArray
             Data in the minibatch. Shape is (N, ...)
         """
-        _arr = _np if is_np_array() else nd
-        _arr_cls = _arr.ndarray if is_np_array() else _arr.NDArray
-        if isinstance(data[0], _arr_cls) and not self._warned:
-            self._warned = True
+        if self._np_array is None:
+            self._np_array = is_np_array()
+        _arr = _np if self._np_array else nd
+        _arr_cls = _arr.ndarray if self._np_array else _arr.NDArray
+        if isinstance(data[0], _arr_cls) and not Pad._warned:
+            Pad._warned = True
             warnings.warn(
                 'Using Pad with NDArrays is discouraged for speed reasons. '
                 'Instead you should pad your data while it is still a list '
                 'and before converting to an NDArray. '
                 'Alternatively you can consider inputting a numpy.ndarray.')
         if isinstance(data[0], (_arr_cls, np.ndarray, list)):
-            padded_arr = _pad_arrs_to_max_length(data, self._pad_val,
-                                                 self._use_shared_mem,
-                                                 self._dtype, self._round_to)
-            return padded_arr
+            return _pad_arrs_to_max_length(data, self._pad_val, self._use_shared_mem,
+                                           self._dtype, self._round_to, _arr)
         else:
             raise NotImplementedError(
                 "Pad() does not support multiple items, use Group(Pad(), Pad(), ...) instead")
@@ -256,23 +422,34 @@ class Pad(object):
         from ._internal import PadBatchify
         return PadBatchify(pad_val=self._pad_val, dtype=self._dtype if self._dtype is not None else -1)
 
-def _append_arrs(arrs, use_shared_mem=False, expand=False, batch_axis=0):
+def _append_arrs(arrs, use_shared_mem=False, expand=False, batch_axis=0, arr_ns=None):
     """Internal impl for returning appened arrays as list."""
-    _arr = _np if is_np_array() else nd
-    if isinstance(arrs[0], _arr.NDArray):
+    _arr = arr_ns
+    if _arr is None:
+        _arr = _np if is_np_array() else nd
+    ctx = Context('cpu_shared', 0) if use_shared_mem else None
+    if isinstance(arrs[0], np.ndarray) and expand:
+        # add the batch axis in numpy, so that each sample costs a single engine op
+        arrs = [np.expand_dims(x, axis=batch_axis) for x in arrs]
+        expand = False
+    if isinstance(arrs[0], nd.NDArray):
         if use_shared_mem:
-            out = [x.as_in_context(Context('cpu_shared', 0)) for x in arrs]
+            out = [x.as_in_context(ctx) for x in arrs]
         else:
             out = arrs
     else:
-        if use_shared_mem:
-            out = [_arr.array(x, ctx=Context('cpu_shared', 0)) for x in arrs]
-        else:
-            out = [_arr.array(x) for x in arrs]
+        out = [_arr.array(x, ctx=ctx) for x in arrs]
 
-    # add batch axis
+    # add batch axis, reshaping is a view and avoids queuing an expand_dims op per sample
     if expand:
-        out = [x.expand_dims(axis=batch_axis) for x in out]
+        expanded = []
+        for x in out:
+            shape = x.shape
+            axis = batch_axis if batch_axis >= 0 else len(shape) + batch_axis + 1
+            shape = shape[:axis] + (1,) + shape[axis:]
+            expanded.append(_reshape_view(x, shape) if isinstance(x, _np.ndarray)
+                            else x.reshape(shape))
+        out = expanded
     return out
 
 
@@ -300,6 +477,7 @@ class Append(object):
         self._expand = expand
         self._batch_axis = batch_axis
         self._use_shared_mem = use_shared_mem
+        self._np_array = None
 
     def __call__(self, data):
         """Batchify the input data.
@@ -311,8 +489,11 @@ class Append(object):
         -------
         batch_data : NDArray
         """
+        if self._np_array is None:
+            self._np_array = is_np_array()
         return _append_arrs(data, use_shared_mem=self._use_shared_mem,
-                            expand=self._expand, batch_axis=self._batch_axis)
+                            expand=self._expand, batch_axis=self._batch_axis,
+                            arr_ns=_np if self._np_array else nd)
 
 class Group(object):
     """Wrap multiple batchify functions together. The input functions will be applied
@@ -356,6 +537,7 @@ class Group(object):
         for i, ele_fn in enumerate(self._fn):
             assert hasattr(ele_fn, '__call__'), 'Batchify functions must be callable! ' \
                                                 'type(fn[%d]) = %s' % (i, str(type(ele_fn)))
+        self._n = len(self._fn)
 
     def __call__(self, data):
         """Batchify the input data.
@@ -368,12 +550,12 @@ class Group(object):
         ret : tuple
             A tuple of length N. Contains the batchified result of each attribute in the input.
         """
-        assert len(data[0]) == len(self._fn),\
-            'The number of attributes in each data sample should contains' \
-            ' {} elements'.format(len(self._fn))
+        if len(data[0]) != self._n:
+            raise ValueError('The number of attributes in each data sample should contains'
+                             ' {} elements'.format(self._n))
         ret = []
         for i, ele_fn in enumerate(self._fn):
-            ret.append(ele_fn([ele[i] for ele in data]))
+            ret.append(ele_fn(list(map(operator.itemgetter(i), data))))
         return tuple(ret)
 
     def __mx_handle__(self):
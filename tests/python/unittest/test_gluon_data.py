@@ -19,6 +19,7 @@ import os
 import tarfile
 import tempfile
 import unittest
+import warnings
 import mxnet as mx
 import numpy as np
 import random
@@ -578,6 +579,16 @@ def test_batchify_stack():
     assert c.shape == d.shape
     assert mx.test_utils.almost_equal(c.asnumpy(), d.asnumpy())
     assert mx.test_utils.almost_equal(c.asnumpy(), np.stack((a, b)))
+    # the batch is created on the current context
+    assert c.context == mx.current_context()
+    with mx.Context('cpu', 1):
+        c = bf([a, b])
+        assert c.context == mx.Context('cpu', 1)
+        assert mx.test_utils.almost_equal(c.asnumpy(), np.stack((a, b)))
+    # tuple samples are stacked field by field
+    c, d = bf([(a, 1), (b, 2)])
+    assert mx.test_utils.almost_equal(c.asnumpy(), np.stack((a, b)))
+    assert mx.test_utils.almost_equal(d.asnumpy(), np.array([1, 2]))
 
 def test_batchify_pad():
     a = np.array([[1, 2, 3, 4], [11, 12, 13, 14]])
@@ -593,6 +604,97 @@ def test_batchify_pad():
                          [[ 4.,  5.,  6., -1.], [-1., -1., -1., -1.]],
                          [[ 9., 10., -1., -1.], [-1., -1., -1., -1.]]])
     assert mx.test_utils.almost_equal(d.asnumpy(), expected)
+    d = bf([np.array(1), np.array(2)])
+    assert d.shape == (2,)
+    assert mx.test_utils.almost_equal(d.asnumpy(), np.array([1, 2]))
+
+@pytest.mark.parametrize('use_numba', [True, False])
+def test_batchify_pad_1d(use_numba, monkeypatch):
+    if use_numba and not mx.gluon.data.batchify._get_pad_flat_numba():
+        pytest.skip('numba is not installed')
+    if not use_numba:
+        monkeypatch.setattr(mx.gluon.data.batchify, '_pad_flat_numba', False)
+    a = [1, 2, 3, 4]
+    b = [4, 5, 6]
+    c = [8, 2]
+    expected = np.array([[1, 2, 3, 4], [4, 5, 6, 0], [8, 2, 0, 0]])
+    for data in ([a, b, c], [np.array(a), np.array(b), np.array(c)],
+                 [mx.nd.array(a), mx.nd.array(b), mx.nd.array(c)]):
+        d = mx.gluon.data.batchify.Pad()(data)
+        assert d.shape == (3, 4)
+        assert mx.test_utils.almost_equal(d.asnumpy(), expected)
+    d = mx.gluon.data.batchify.Pad(val=-1, dtype='float32', round_to=3)([a, b, c])
+    assert d.dtype == np.float32
+    expected = np.array([[1, 2, 3, 4, -1, -1], [4, 5, 6, -1, -1, -1], [8, 2, -1, -1, -1, -1]])
+    assert mx.test_utils.almost_equal(d.asnumpy(), expected)
+    # the dtype is inferred from the first non-empty sample, regardless of the order
+    d = mx.gluon.data.batchify.Pad()([[1, 2], []])
+    e = mx.gluon.data.batchify.Pad()([[], [1, 2]])
+    assert d.dtype == e.dtype == np.int64
+    assert mx.test_utils.almost_equal(e.asnumpy(), np.array([[0, 0], [1, 2]]))
+    d = mx.gluon.data.batchify.Pad(val=-1, dtype='float16')([a, b, c])
+    assert d.dtype == np.float16
+    expected = np.array([[1, 2, 3, 4], [4, 5, 6, -1], [8, 2, -1, -1]], dtype=np.float16)
+    assert np.array_equal(d.asnumpy(), expected)
+    d = mx.gluon.data.batchify.Pad(dtype=bool)([[1, 1, 1], [1], [1, 1]])
+    assert d.dtype == np.bool_
+    expected = np.array([[True, True, True], [True, False, False], [True, True, False]])
+    assert np.array_equal(d.asnumpy(), expected)
+
+def test_batchify_pad_ndarray():
+    bf = mx.gluon.data.batchify.Pad(val=-1)
+    # samples only differ in the first axis, so they are copied with a single concat
+    a = mx.nd.array([[1, 2, 3], [4, 5, 6]])
+    b = mx.nd.array([[7, 8, 9]])
+    d = bf([a, b])
+    expected = np.array([[[1, 2, 3], [4, 5, 6]], [[7, 8, 9], [-1, -1, -1]]])
+    assert d.shape == (2, 2, 3)
+    assert mx.test_utils.almost_equal(d.asnumpy(), expected)
+    # trailing shapes differ, each sample is copied on its own
+    a = mx.nd.array([[1, 2, 3], [4, 5, 6]])
+    b = mx.nd.array([[7, 8]])
+    d = bf([a, b])
+    expected = np.array([[[1, 2, 3], [4, 5, 6]], [[7, 8, -1], [-1, -1, -1]]])
+    assert d.shape == (2, 2, 3)
+    assert mx.test_utils.almost_equal(d.asnumpy(), expected)
+
+def test_batchify_pad_ndarray_warns_once(monkeypatch):
+    monkeypatch.setattr(mx.gluon.data.batchify.Pad, '_warned', False)
+    data = [mx.nd.array([1, 2, 3]), mx.nd.array([4])]
+    with pytest.warns(UserWarning, match='discouraged'):
+        mx.gluon.data.batchify.Pad()(data)
+    with warnings.catch_warnings(record=True) as record:
+        warnings.simplefilter('always')
+        mx.gluon.data.batchify.Pad()(data)
+        mx.gluon.data.batchify.Pad(val=-1)(data)
+    assert not [w for w in record if 'discouraged' in str(w.message)]
+
+def test_batchify_pad_shared_mem():
+    a = np.array([[1, 2, 3, 4], [11, 12, 13, 14]])
+    b = np.array([[4, 5, 6]])
+    bf = mx.gluon.data.batchify.Pad(val=-1, use_shared_mem=True)
+    d = bf([a, b])
+    assert d.context == mx.Context('cpu_shared', 0)
+    expected = np.array([[[1, 2, 3, 4], [11, 12, 13, 14]],
+                         [[4, 5, 6, -1], [-1, -1, -1, -1]]])
+    assert mx.test_utils.almost_equal(d.asnumpy(), expected)
+    d = bf([[1, 2, 3], [4]])
+    assert d.context == mx.Context('cpu_shared', 0)
+    assert mx.test_utils.almost_equal(d.asnumpy(), np.array([[1, 2, 3], [4, -1, -1]]))
+
+def test_batchify_append():
+    a = np.array([[1, 2, 3, 4], [5, 6, 7, 8]])
+    b = np.array([[4, 5, 6]])
+    for data in ([a, b], [mx.nd.array(a), mx.nd.array(b)]):
+        out = mx.gluon.data.batchify.Append()(data)
+        assert out[0].shape == (1, 2, 4)
+        assert out[1].shape == (1, 1, 3)
+        assert mx.test_utils.almost_equal(out[0].asnumpy(), a[np.newaxis])
+        assert mx.test_utils.almost_equal(out[1].asnumpy(), b[np.newaxis])
+        out = mx.gluon.data.batchify.Append(batch_axis=-1, use_shared_mem=True)(data)
+        assert out[0].shape == (2, 4, 1)
+        assert out[1].context == mx.Context('cpu_shared', 0)
+        assert mx.test_utils.almost_equal(out[1].asnumpy(), b[..., np.newaxis])
 
 def test_batchify_group():
     a = [np.array([[1, 2, 3, 4], [5, 6, 7, 8]]), np.array([[1, 2, 3, 4], [11, 12, 13, 14]])]
@@ -612,3 +714,5 @@ def test_batchify_group():
                          [[ 4.,  5.,  6., -1.], [-1., -1., -1., -1.]],
                          [[ 9., 10., -1., -1.], [-1., -1., -1., -1.]]])
     assert mx.test_utils.almost_equal(d[1].asnumpy(), expected)
+    with pytest.raises(ValueError):
+        bf([[np.array([1, 2])], a])